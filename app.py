@@ -1,11 +1,12 @@
 import gradio as gr
-from chatbot import generate_response
+from chatbot import APP_CONCURRENCY, generate_response, session_store
 
-# تعريف دالة التفاعل مع الشات بوت
-def chat_with_bot(user_input, history=None):
+# تعريف دالة التفاعل مع الشات بوت (session_hash يميز محادثة كل مستخدم)
+def chat_with_bot(user_input, history=None, request: gr.Request = None):
     if history is None:
         history = []
-    response = generate_response(user_input)
+    session_id = request.session_hash if request is not None else None
+    response = generate_response(user_input, session_id=session_id)
     history.append((user_input, response))
     return history, ""
 
@@ -22,8 +23,15 @@ with gr.Blocks() as app:
     clear_btn = gr.Button("🧹 مسح الدردشة")
 
     msg.submit(chat_with_bot, inputs=[msg, chatbot], outputs=[chatbot, msg])
-    clear_btn.click(lambda: ([], ""), outputs=[chatbot, msg])
+    def clear_chat(request: gr.Request):
+        session_store.drop(request.session_hash)
+        return [], ""
+
+    clear_btn.click(clear_chat, outputs=[chatbot, msg])
 
 # تشغيل التطبيق
+# عدد الطلبات المتزامنة يطابق حجم مجموعة خيوط النموذج في chatbot.py
+app.queue(default_concurrency_limit=APP_CONCURRENCY)
+
 if __name__ == "__main__":
     app.launch(share=True)
@@ -0,0 +1,28 @@
+import re
+
+ARABIC_DIACRITICS = re.compile(r"[\u064B-\u0652\u0670\u0640]")
+ARABIC_LETTER_VARIANTS = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ى": "ي", "ة": "ه"})
+WORD_PATTERN = re.compile(r"\w+")
+
+# Light prefix stemming: conjunction/preposition + article ("والصلاه" -> "صلاه")
+ARTICLE_PREFIX = re.compile(r"^(?:وال|بال|فال|كال|لل|ال)(?=\w{2,})")
+
+# Question words and particles that carry no topical signal (already normalized)
+STOPWORDS = {
+    "ما", "ماذا", "هل", "كيف", "متي", "اين", "لماذا", "من", "في", "علي", "عن", "الي", "او", "ثم", "ان", "لا",
+    "هو", "هي", "هذا", "هذه", "ذلك", "التي", "الذي", "مع", "كان", "قد", "كل", "بين", "عند", "سؤال", "فقهي",
+}
+
+
+def normalize_text(text):
+    """Strip tashkeel/tatweel and fold common letter variants so near-identical copies compare equal"""
+    return ARABIC_DIACRITICS.sub("", text).translate(ARABIC_LETTER_VARIANTS).lower()
+
+
+def tokenize(text):
+    return WORD_PATTERN.findall(normalize_text(text))
+
+
+def terms(text):
+    """Content terms for lexical matching: normalized, stopwords removed, article prefixes stripped"""
+    return [ARTICLE_PREFIX.sub("", token) for token in tokenize(text) if token not in STOPWORDS]
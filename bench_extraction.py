@@ -0,0 +1,120 @@
+import argparse
+import glob
+import hashlib
+import os
+import re
+import time
+from collections import Counter
+
+from extraction import CONTENT_SELECTORS, EXTRACTORS
+
+FIXTURES_DIR = "fixtures/pages"
+TOKEN = re.compile(r"\w+")
+
+
+def legacy_extract(html):
+    """The original scrap.py behaviour: html.parser + get_text(strip=True)"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    for selector in CONTENT_SELECTORS:
+        main_text_div = soup.select_one(selector)
+        if main_text_div:
+            return {"text": main_text_div.get_text(strip=True), "paragraphs": [], "footnotes": []}
+    return None
+
+
+def reference_tokens(html):
+    """Ground-truth word boundaries: every text node separated by a space"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    for selector in CONTENT_SELECTORS:
+        root = soup.select_one(selector)
+        if root:
+            return Counter(TOKEN.findall(root.get_text(" ")))
+    return Counter()
+
+
+def token_f1(output, reference):
+    """Word-level F1 against the reference; merged words across tags count as misses"""
+    if output is None:
+        return 0.0
+    tokens = Counter(TOKEN.findall(output["text"] + " " + " ".join(f["text"] for f in output["footnotes"])))
+    overlap = sum((tokens & reference).values())
+    if not overlap:
+        return 0.0
+    precision = overlap / sum(tokens.values())
+    recall = overlap / sum(reference.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def load_fixtures(fixtures_dir):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, "*.html"))):
+        with open(path, "r", encoding="utf-8") as f:
+            pages.append(f.read())
+    return pages
+
+
+def save_fixtures(urls, fixtures_dir):
+    """Download lecture pages once so benchmarks run offline and stay comparable"""
+    from scrap import HEADERS
+    import requests
+
+    os.makedirs(fixtures_dir, exist_ok=True)
+    for url in urls:
+        resp = requests.get(url, headers=HEADERS, timeout=10)
+        resp.raise_for_status()
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12] + ".html"
+        with open(os.path.join(fixtures_dir, name), "w", encoding="utf-8") as f:
+            f.write(resp.text)
+        print(f"💾 {url} -> {name}")
+
+
+def benchmark(pages, engines, repeat=3):
+    references = [reference_tokens(html) for html in pages]
+    results = []
+    for name in engines:
+        extract = legacy_extract if name == "legacy" else EXTRACTORS[name]().extract
+        outputs = []
+        start = time.perf_counter()
+        for _ in range(repeat):
+            outputs = [extract(html) for html in pages]
+        elapsed = time.perf_counter() - start
+        found = [o for o in outputs if o is not None]
+        results.append({
+            "engine": name,
+            "pages_per_s": repeat * len(pages) / elapsed if elapsed else 0.0,
+            "f1": sum(token_f1(o, ref) for o, ref in zip(outputs, references)) / len(pages),
+            "found": len(found),
+            "paragraphs": sum(len(o["paragraphs"]) for o in found),
+            "footnotes": sum(len(o["footnotes"]) for o in found),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark lecture HTML extraction engines on saved pages")
+    parser.add_argument("--fixtures", type=str, default=FIXTURES_DIR)
+    parser.add_argument("--engines", nargs="+", default=["legacy", "soup", "lxml"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", nargs="+", metavar="URL", help="download these lecture pages as fixtures first")
+    args = parser.parse_args()
+
+    if args.save:
+        save_fixtures(args.save, args.fixtures)
+
+    pages = load_fixtures(args.fixtures)
+    if not pages:
+        print(f"❌ No fixture pages in {args.fixtures} (use --save URL ... to create them)")
+        return
+    print(f"📄 {len(pages)} fixture pages, {args.repeat} passes each")
+
+    print(f"\n{'engine':<8} {'pages/s':>9} {'token F1':>9} {'found':>6} {'paras':>7} {'notes':>7}")
+    for r in benchmark(pages, args.engines, args.repeat):
+        print(f"{r['engine']:<8} {r['pages_per_s']:>9.1f} {r['f1']:>9.3f} {r['found']:>6} {r['paragraphs']:>7} {r['footnotes']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,20 @@
 import os
 import logging
 import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from functools import lru_cache
+from threading import Lock
+import openai
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_chroma import Chroma
+from payload_store import PAYLOAD_DIR, PayloadStore, build_payload_store_from_chroma
+from index_snapshot import active_vector_store_path
+from session import SessionStore
+from reranker import rerank
+from extractive import extractive_answer
+from responses import FALLBACK_HEADING, RETRIEVAL_ERROR_MESSAGE
 
 # إعداد تسجيل المعلومات
 logging.basicConfig(level=logging.INFO)
@@ -17,16 +29,78 @@ def configure_openai_api_key():
 
 configure_openai_api_key()
 
-# تحميل قاعدة البيانات المتجهية
+# حالة المحادثات (أجزاء الأدوار السابقة ومتجهاتها) لكل جلسة
+session_store = SessionStore()
+
+# ميزانية الزمن لكل طلب؛ بعد انتهائها نعرض إجابة استخلاصية محلية بدل انتظار النموذج
+RESPONSE_DEADLINE_S = float(os.getenv("RESPONSE_DEADLINE_S", "20"))
+# إرسال طلب ثانٍ موازٍ للنموذج إذا لم يرد الأول خلال هذه المدة (0 لتعطيله)
+LLM_HEDGE_AFTER_S = float(os.getenv("LLM_HEDGE_AFTER_S", "8"))
+EMBEDDING_TIMEOUT_S = 10
+# إعادة محاولة متجه السؤال عند الأخطاء العابرة (429/5xx/الاتصال) طالما بقي وقت في الميزانية
+EMBEDDING_RETRY_BACKOFF_S = 0.25
+TRANSIENT_OPENAI_ERRORS = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+# عدد الطلبات التي يعالجها التطبيق في آن واحد؛ كل طلب قد يشغل خيطين (المحاولة الأصلية والموازية)
+APP_CONCURRENCY = int(os.getenv("APP_CONCURRENCY", "16"))
+llm_executor = ThreadPoolExecutor(max_workers=2 * APP_CONCURRENCY, thread_name_prefix="llm")
+
+# عميلا OpenAI يُنشآن مرة واحدة لكل عملية ويُعاد استخدام اتصالاتهما؛ المهلة تُمرَّر مع كل طلب،
+# وإعادة المحاولة تتم هنا ضمن ميزانية الطلب بدل إعادة المحاولات الخفية داخل العميل
+@lru_cache(maxsize=1)
+def load_embeddings():
+    return OpenAIEmbeddings(model="text-embedding-ada-002", timeout=EMBEDDING_TIMEOUT_S, max_retries=0)
+
+@lru_cache(maxsize=1)
+def load_llm():
+    return ChatOpenAI(model_name="gpt-4o-mini", temperature=0.0, max_retries=0)  # تقليل الإبداع إلى 0
+
+# تحميل قاعدة البيانات المتجهية (مرة واحدة لكل عملية)
+@lru_cache(maxsize=1)
 def load_vector_store(vector_store_path="./vector_store"):
-    embeddings = OpenAIEmbeddings(model="text-embedding-ada-002")
-    return Chroma(persist_directory=vector_store_path, embedding_function=embeddings)
+    return Chroma(persist_directory=vector_store_path, embedding_function=load_embeddings())
+
+# تحميل مخزن النصوص المضغوط، وبناؤه من Chroma إذا كان مفقودًا أو لا يطابق المجموعة
+# (القفل يمنع الطلبات المتزامنة الأولى من بناء المخزن نفسه مرتين)
+payload_store_lock = Lock()
 
-# استرجاع المستندات ذات الصلة
-def retrieve_documents(query, top_k=10):
-    db = load_vector_store()
-    retriever = db.as_retriever(search_kwargs={"k": top_k})
-    docs = retriever.invoke(query)
+@lru_cache(maxsize=1)
+def load_payload_store(vector_store_path="./vector_store"):
+    store_dir = os.path.join(vector_store_path, PAYLOAD_DIR)
+    db = load_vector_store(vector_store_path)
+    with payload_store_lock:
+        if os.path.exists(store_dir):
+            payload = PayloadStore(store_dir)
+            if len(payload) == db._collection.count():
+                return payload
+            logging.warning(f"⚠️ Payload store has {len(payload)} chunks but the collection has {db._collection.count()}; rebuilding")
+            payload.close()
+        logging.info("📦 Building payload store from Chroma collection...")
+        build_payload_store_from_chroma(db, store_dir)
+        payload = PayloadStore(store_dir)
+        if len(payload) != db._collection.count():
+            raise RuntimeError(f"❌ Payload store at {store_dir} does not match the Chroma collection")
+        return payload
+
+# استرجاع المستندات ذات الصلة (معرفات فقط من Chroma، والنصوص من المخزن المضغوط)
+# (المسار يُقرأ في كل طلب، فتفعيل لقطة جديدة ينقل الخدمة إليها دون إعادة تشغيل)
+# الأسئلة التابعة تُبحث أولًا في أجزاء الأدوار السابقة للجلسة قبل الفهرس العام
+def retrieve_documents(query, top_k=10, session=None, follow_up=False, deadline=None):
+    vector_store_path = active_vector_store_path()
+    db = load_vector_store(vector_store_path)
+    payload = load_payload_store(vector_store_path)
+    query_embedding = embed_query_with_deadline(query, deadline or time.monotonic() + EMBEDDING_TIMEOUT_S)
+
+    chunk_ids = session.search_pool(query_embedding, top_k) if session is not None and follow_up else []
+    if chunk_ids:
+        logging.info(f"♻️ Answered retrieval from session pool ({len(chunk_ids)} chunks)")
+        session.record(query, follow_up, chunk_ids, query_embedding)
+    else:
+        include = ["distances", "embeddings"] if session is not None else ["distances"]
+        results = db._collection.query(query_embeddings=[query_embedding], n_results=top_k, include=include)
+        chunk_ids = results["ids"][0]
+        if session is not None:
+            session.record(query, follow_up, chunk_ids, query_embedding, results["embeddings"][0])
+    docs = payload.get_many(chunk_ids)
 
     if not docs:
         logging.warning("⚠️ لم يتم العثور على أي مستندات ذات صلة.")
@@ -34,6 +108,15 @@ def retrieve_documents(query, top_k=10):
 
     return docs
 
+# قياس زمن كل مرحلة (بالمللي ثانية)
+@contextmanager
+def timed(timings, stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = (time.perf_counter() - start) * 1000
+
 # التأكد من أن السؤال فقهي
 def is_fiqh_related(query, relevant_docs):
     keywords = ["حكم", "شروط", "الصلاة", "الزكاة", "الحج", "الصوم", "الطهارة", "الوضوء", "الكفارة", "الطلاق",
@@ -41,10 +124,91 @@ def is_fiqh_related(query, relevant_docs):
                 "السعي", "ما حكم", "كيف", "هل يجوز", "ما هي", "ما هو", "متى", "هل يجب"]
     return any(word in query for word in keywords) or bool(relevant_docs)
 
+# حساب متجه السؤال ضمن المهلة المتبقية، مع إعادة المحاولة عند الأخطاء العابرة دون تجاوز الميزانية
+def embed_query_with_deadline(query, deadline):
+    embeddings = load_embeddings()
+    deadline = min(deadline, time.monotonic() + EMBEDDING_TIMEOUT_S)
+    backoff = EMBEDDING_RETRY_BACKOFF_S
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("No time left for the embedding request")
+        try:
+            response = embeddings.client.create(input=[query], model=embeddings.model, timeout=remaining)
+            return response.data[0].embedding
+        except TRANSIENT_OPENAI_ERRORS as e:
+            if time.monotonic() + backoff >= deadline:
+                raise
+            logging.warning(f"⚠️ Embedding attempt failed ({type(e).__name__}), retrying in {backoff:.2f}s")
+            time.sleep(backoff)
+            backoff *= 2
+
+# كل محاولة تأخذ مهلتها من الوقت المتبقي لحظة إرسالها، فلا تشغل خيطًا بعد انتهاء الميزانية
+def submit_llm_attempt(prompt, deadline):
+    timeout = max(0.1, deadline - time.monotonic())
+    return llm_executor.submit(load_llm().invoke, [prompt], timeout=timeout)
+
+# استدعاء النموذج ضمن المهلة المتبقية، مع طلب احتياطي موازٍ عند التأخر أو الفشل
+def invoke_llm_with_deadline(prompt, deadline):
+    """يُرجع نص الإجابة، أو None إذا انتهت المهلة أو فشلت كل المحاولات"""
+    start = time.monotonic()
+    if start >= deadline:
+        return None
+    pending = {submit_llm_attempt(prompt, deadline)}
+    hedge_at = start + LLM_HEDGE_AFTER_S if LLM_HEDGE_AFTER_S > 0 else None
+
+    while True:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        timeout = deadline - now
+        if hedge_at is not None:
+            timeout = max(0.0, min(timeout, hedge_at - now))
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                return future.result().content.strip()
+            except Exception as e:
+                logging.warning(f"⚠️ LLM call failed: {e}")
+        if hedge_at is not None and (time.monotonic() >= hedge_at or not pending):
+            logging.info("🔀 Sending hedged LLM request")
+            pending.add(submit_llm_attempt(prompt, deadline))
+            hedge_at = None
+        elif not pending:
+            break
+
+    for future in pending:
+        future.cancel()
+    return None
+
+# تنسيق الإجابة النهائية مع رابط المصدر والتنبيه
+def format_response(query, answer, source_url, heading="📖 **الإجابة:**"):
+    return f"""
+📌 **السؤال:** {query}
+
+{heading}
+{answer}
+
+🔗 **المصدر الأول:** [اضغط هنا]({source_url or '#'})
+
+✅ **إذا احتجت إلى مزيد من التفاصيل، يُرجى مراجعة المصادر الموثوقة مثل دار الإفتاء والهيئة العامة للأوقاف.**
+    """
+
 # توليد الإجابة بناءً على قاعدة البيانات فقط
-def generate_response(query):
+def generate_response(query, session_id=None):
     logging.info(f"🔍 Querying: {query}")
-    relevant_docs = retrieve_documents(query)
+    deadline = time.monotonic() + RESPONSE_DEADLINE_S
+    session = session_store.get(session_id) if session_id is not None else None
+    search_query, follow_up = session.rewrite(query) if session is not None else (query, False)
+    if follow_up:
+        logging.info(f"🔁 Follow-up expanded to: {search_query}")
+    timings = {}
+    with timed(timings, "retrieve"):
+        try:
+            relevant_docs = retrieve_documents(search_query, session=session, follow_up=follow_up, deadline=deadline)
+        except Exception as e:
+            logging.error(f"❌ Retrieval failed: {e}")
+            return RETRIEVAL_ERROR_MESSAGE
 
     if not is_fiqh_related(query, relevant_docs):
         logging.warning("🚫 السؤال غير فقهي.")
@@ -53,6 +217,12 @@ def generate_response(query):
     if not relevant_docs:
         return "❌ لم أجد إجابة مباشرة لهذا السؤال، يُرجى البحث في المصادر الموثوقة."
 
+    # **إعادة الترتيب: فقط الأجزاء الأكثر صلة تصل إلى النموذج**
+    with timed(timings, "rerank"):
+        reranked = rerank(search_query, relevant_docs)
+    logging.info(f"🎯 Reranked {len(relevant_docs)} → {len(reranked)} chunks (scores: {[round(score, 2) for _, score in reranked]})")
+    relevant_docs = [doc for doc, _ in reranked]
+
     # **تنظيم المستندات داخل Full Prompt**
     context_sections = []
     for idx, doc in enumerate(relevant_docs, 1):
@@ -60,6 +230,9 @@ def generate_response(query):
 
     context = "\n\n".join(context_sections)
 
+    # النموذج يرى سؤال المستخدم كما كتبه، مع السؤال السابق كسياق عند المتابعة
+    conversation_context = f"🔹 **السؤال السابق في المحادثة:** {session.topic_query}\n" if follow_up else ""
+
     # **تحسين `full_prompt` لمنع التوليد مع السماح بإعادة الصياغة عند توفر المعلومات**
     full_prompt = f"""
 📖 **المعلومات المسترجعة من قاعدة البيانات:**
@@ -71,30 +244,26 @@ def generate_response(query):
 - **إذا لم تكن هناك معلومات كافية، فقط أذكر "المعلومات غير متوفرة"**.
 - **لا تفسر أو تضيف أي رأي شخصي، بل استخدم المعلومات المتاحة فقط**.
 
-🔹 **السؤال:** {query}
+{conversation_context}🔹 **السؤال:** {query}
 """
 
-    llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.0)  # تقليل الإبداع إلى 0
-    refined_response = llm.invoke([full_prompt])
+    with timed(timings, "generate"):
+        response_text = invoke_llm_with_deadline(full_prompt, deadline)
 
-    response_text = refined_response.content.strip()
+    # ✅ **عند تأخر النموذج أو فشله: إجابة استخلاصية من أفضل الأجزاء المسترجعة**
+    if response_text is None:
+        with timed(timings, "extractive"):
+            extract, source_doc = extractive_answer(search_query, relevant_docs)
+        logging.warning("⏰ LLM missed the deadline, returning extractive answer")
+        logging.info("⏱️ Timings: " + ", ".join(f"{stage}={ms:.0f}ms" for stage, ms in timings.items()))
+        return format_response(query, extract, source_doc.url, heading=FALLBACK_HEADING)
+    logging.info("⏱️ Timings: " + ", ".join(f"{stage}={ms:.0f}ms" for stage, ms in timings.items()))
 
     # ✅ **منع توليد إجابة إذا لم تكن هناك معلومات كافية**
     if "المعلومات غير متوفرة" in response_text or response_text == "":
         return "❌ لم أجد إجابة مباشرة لهذا السؤال، يُرجى البحث في المصادر الرسمية."
 
-    formatted_response = f"""
-📌 **السؤال:** {query}
-
-📖 **الإجابة:**
-{response_text}
-
-🔗 **المصدر الأول:** [اضغط هنا]({relevant_docs[0].metadata.get('url', '#')})
-
-✅ **إذا احتجت إلى مزيد من التفاصيل، يُرجى مراجعة المصادر الموثوقة مثل دار الإفتاء والهيئة العامة للأوقاف.**
-    """
-
-    return formatted_response
+    return format_response(query, response_text, relevant_docs[0].url)
 
 if __name__ == "__main__":
     print("""
@@ -0,0 +1,88 @@
+import hashlib
+import logging
+import random
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from langchain.docstore.document import Document
+
+from arabic_text import tokenize
+
+# MinHash + LSH: 64 permutations split into 16 bands of 4 rows
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_SIZE = 3
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def _shingle_hashes(text):
+    tokens = tokenize(text)
+    if len(tokens) < SHINGLE_SIZE:
+        shingles = {" ".join(tokens)}
+    else:
+        shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    return [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles]
+
+
+def _permutations(seed=1):
+    rng = random.Random(seed)
+    return [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+
+def minhash_signature(text, permutations):
+    hashes = _shingle_hashes(text)
+    return tuple(min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in permutations)
+
+
+def _estimated_jaccard(sig_a, sig_b):
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+# Remove near-duplicate chunks, keeping the first occurrence as canonical
+def deduplicate_chunks(documents: List[Document], threshold=0.8) -> Tuple[List[Document], Dict[str, float]]:
+    permutations = _permutations()
+    signatures = [minhash_signature(doc.page_content, permutations) for doc in documents]
+
+    # LSH banding: only canonical chunks are indexed, and each new chunk is compared with the canonicals
+    # sharing at least one band bucket. A chunk is only dropped if it meets the threshold against the
+    # canonical it is dropped for (no transitive A~B~C chains)
+    rows = NUM_PERM // BANDS
+    buckets = [{} for _ in range(BANDS)]
+    groups = defaultdict(list)
+    for idx, signature in enumerate(signatures):
+        keys = [signature[band * rows:(band + 1) * rows] for band in range(BANDS)]
+        candidates = sorted({c for band, key in enumerate(keys) for c in buckets[band].get(key, ())})
+        canonical = next((c for c in candidates if _estimated_jaccard(signatures[c], signature) >= threshold), None)
+        if canonical is None:
+            canonical = idx
+            for band, key in enumerate(keys):
+                buckets[band].setdefault(key, []).append(idx)
+        groups[canonical].append(idx)
+
+    kept = []
+    for canonical, members in sorted(groups.items()):
+        doc = documents[canonical]
+        own_url = doc.metadata.get("url")
+        also_in = []
+        for idx in members[1:]:
+            url = documents[idx].metadata.get("url")
+            if url and url != own_url and url not in also_in:
+                also_in.append(url)
+        if also_in:
+            # Chroma metadata values must be scalars, so back-references are stored joined
+            doc.metadata["also_in"] = " | ".join(also_in)
+        kept.append(doc)
+
+    removed = len(documents) - len(kept)
+    report = {
+        "chunks_before": len(documents),
+        "chunks_after": len(kept),
+        "removed": removed,
+        "removed_pct": 100.0 * removed / len(documents) if documents else 0.0,
+        "removed_chars": sum(len(documents[i].page_content) for m in groups.values() for i in m[1:]),
+    }
+    logging.info(
+        f"Deduplication removed {removed} of {len(documents)} chunks "
+        f"({report['removed_pct']:.1f}%, {report['removed_chars']} characters)"
+    )
+    return kept, report
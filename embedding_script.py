@@ -5,6 +5,12 @@ from langchain.docstore.document import Document
 from langchain_openai import OpenAIEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
+from payload_store import PAYLOAD_DIR, content_chunk_ids, write_payload_store
+from index_snapshot import write_ingestion_config
+from dedup import deduplicate_chunks
+from extraction import lecture_text
+
+EMBED_BATCH = 5000
 
 
 # Configure OpenAI API Key
@@ -28,7 +34,7 @@ def load_json_data(file_paths):
         for category, entries in data.items():
             for entry in entries:
                 doc = Document(
-                    page_content=entry["content"],
+                    page_content=lecture_text(entry),
                     metadata={
                         "title": entry["lecture_title"],
                         "url": entry["lecture_url"],
@@ -48,18 +54,69 @@ def chunk_documents(documents, chunk_size=1000, chunk_overlap=100):
     return text_splitter.split_documents(documents)
 
 
+# Load HNSW collection settings written by tune_hnsw.py (Chroma defaults if absent)
+def load_collection_metadata(config_file="collection_config.json"):
+    if not os.path.exists(config_file):
+        return None
+    with open(config_file, 'r', encoding='utf-8') as f:
+        return json.load(f)["collection_metadata"]
+
+
+def collection_metadata_matches(collection, collection_metadata):
+    current = collection.metadata or {}
+    return all(current.get(key) == value for key, value in (collection_metadata or {}).items())
+
+
 # Create vector store
-def create_vector_store(documents, vector_store_path="./vector_store"):
+def create_vector_store(documents, vector_store_path="./vector_store", collection_metadata=None):
     if not os.path.exists(vector_store_path):
         os.makedirs(vector_store_path)
 
+    ids = content_chunk_ids(documents)
     embeddings = OpenAIEmbeddings(model="text-embedding-ada-002")
-    vector_store = Chroma.from_documents(
-        documents=documents,
-        embedding=embeddings,
+
+    # Reuse stored vectors for chunks whose content-derived id already exists: unchanged chunks are not re-embedded,
+    # so their snapshot units stay byte-identical and an index refresh only ships new or edited chunks
+    existing = Chroma(persist_directory=vector_store_path, embedding_function=embeddings)
+    vectors = {}
+    for start in range(0, len(ids), EMBED_BATCH):
+        found = existing._collection.get(ids=ids[start:start + EMBED_BATCH], include=["embeddings"])
+        vectors.update(zip(found["ids"], found["embeddings"]))
+    missing = [i for i, chunk_id in enumerate(ids) if chunk_id not in vectors]
+    logging.info(f"Reusing {len(ids) - len(missing)} stored vectors, embedding {len(missing)} new chunks")
+    new_vectors = embeddings.embed_documents([documents[i].page_content for i in missing]) if missing else []
+    for i, vector in zip(missing, new_vectors):
+        vectors[ids[i]] = vector
+
+    # Ingestion is a full rebuild: drop the existing collection so the index and payload store hold the same chunks,
+    # and so HNSW settings from collection_config.json apply (Chroma only reads them when a collection is created)
+    if not collection_metadata_matches(existing._collection, collection_metadata):
+        logging.info(f"Recreating collection with HNSW settings {collection_metadata} (was {existing._collection.metadata})")
+    existing.delete_collection()
+    vector_store = Chroma(
         persist_directory=vector_store_path,
+        embedding_function=embeddings,
+        collection_metadata=collection_metadata,
     )
+    for start in range(0, len(ids), EMBED_BATCH):
+        batch = ids[start:start + EMBED_BATCH]
+        vector_store._collection.add(
+            ids=batch,
+            embeddings=[[float(x) for x in vectors[chunk_id]] for chunk_id in batch],
+            documents=[doc.page_content for doc in documents[start:start + EMBED_BATCH]],
+            metadatas=[doc.metadata for doc in documents[start:start + EMBED_BATCH]],
+        )
     vector_store.persist()
+    if not collection_metadata_matches(vector_store._collection, collection_metadata):
+        raise RuntimeError(f"Collection metadata {vector_store._collection.metadata} does not match {collection_metadata}")
+
+    # Compact payload store read by the chatbot instead of Chroma's sqlite
+    write_payload_store(
+        ids,
+        [doc.page_content for doc in documents],
+        [doc.metadata for doc in documents],
+        os.path.join(vector_store_path, PAYLOAD_DIR),
+    )
     return vector_store
 
 
@@ -76,6 +133,19 @@ if __name__ == "__main__":
     split_documents = chunk_documents(documents)
     logging.info(f"Total chunks created: {len(split_documents)}")
 
+    logging.info("Removing near-duplicate chunks...")
+    split_documents, dedup_report = deduplicate_chunks(split_documents)
+    logging.info(f"Chunks after deduplication: {len(split_documents)}")
+
     logging.info("Creating vector store...")
-    vector_store = create_vector_store(split_documents, vector_store_path)
+    collection_metadata = load_collection_metadata()
+    vector_store = create_vector_store(split_documents, vector_store_path, collection_metadata)
+    write_ingestion_config(vector_store_path, {
+        "json_files": json_file_paths,
+        "chunk_size": 1000,
+        "chunk_overlap": 100,
+        "embedding_model": "text-embedding-ada-002",
+        "dedup": dedup_report,
+        "collection_metadata": collection_metadata,
+    })
     logging.info("Vector store successfully created and persisted.")
@@ -0,0 +1,177 @@
+import re
+
+# Selectors tried in order for the lecture body (same order scrap.py always used)
+CONTENT_SELECTORS = ("div.w-100.mt-4", "div.card-text", "div.content")
+# Footnote / citation popups inside the body; each becomes a numbered entry in "footnotes"
+FOOTNOTE_SELECTORS = ("span.tip", ".footnote", "sup.fn")
+
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "blockquote", "li", "ul", "ol", "table", "tr", "td", "th",
+    "h1", "h2", "h3", "h4", "h5", "h6", "pre", "hr",
+}
+SKIP_TAGS = {"script", "style", "noscript", "template"}
+WHITESPACE = re.compile(r"\s+")
+
+
+def _clean(text):
+    return WHITESPACE.sub(" ", text).strip()
+
+
+class _Collector:
+    """Accumulates inline text and cuts it into paragraphs at block boundaries"""
+
+    def __init__(self):
+        self.paragraphs = []
+        self.footnotes = []
+        self._buffer = []
+
+    def text(self, value):
+        if value:
+            self._buffer.append(value)
+
+    def footnote(self, value):
+        number = len(self.footnotes) + 1
+        self.footnotes.append({"id": number, "text": _clean(value)})
+        self._buffer.append(f"[{number}]")
+
+    def flush(self):
+        paragraph = _clean("".join(self._buffer))
+        if paragraph:
+            self.paragraphs.append(paragraph)
+        self._buffer = []
+
+    def result(self):
+        self.flush()
+        return {"text": "\n".join(self.paragraphs), "paragraphs": self.paragraphs, "footnotes": self.footnotes}
+
+
+class LxmlExtractor:
+    """libxml2-backed extractor with selectors compiled once to XPath"""
+
+    name = "lxml"
+
+    def __init__(self, content_selectors=CONTENT_SELECTORS, footnote_selectors=FOOTNOTE_SELECTORS):
+        import lxml.etree
+        import lxml.html
+        from lxml.cssselect import CSSSelector
+
+        # Always parse UTF-8 bytes: lxml rejects str input that carries an XML encoding declaration
+        self._parser = lxml.html.HTMLParser(encoding="utf-8")
+        self._parse = lambda data: lxml.html.fromstring(data, parser=self._parser)
+        self._parser_error = lxml.etree.ParserError
+        self._content = [CSSSelector(selector, translator="html") for selector in content_selectors]
+        self._footnotes = CSSSelector(", ".join(footnote_selectors), translator="html")
+
+    def extract(self, html):
+        if isinstance(html, str):
+            html = html.encode("utf-8")
+        if not html.strip():
+            return None
+        try:
+            tree = self._parse(html)
+        except self._parser_error:  # "Document is empty" (e.g. only comments or whitespace)
+            return None
+        for selector in self._content:
+            matches = selector(tree)
+            if matches:
+                root = matches[0]
+                break
+        else:
+            return None
+
+        footnotes = set(self._footnotes(root))
+        collector = _Collector()
+        self._visit(root, collector, footnotes)
+        return collector.result()
+
+    def _visit(self, element, collector, footnotes):
+        tag = element.tag if isinstance(element.tag, str) else None  # comments / processing instructions
+        if element in footnotes:
+            collector.footnote(element.text_content())
+        elif tag is not None and tag not in SKIP_TAGS:
+            block = tag in BLOCK_TAGS
+            if block or tag == "br":
+                collector.flush()
+            collector.text(element.text)
+            for child in element:
+                self._visit(child, collector, footnotes)
+            if block:
+                collector.flush()
+        collector.text(element.tail)
+
+
+class SoupExtractor:
+    """BeautifulSoup fallback producing the same structure (uses lxml as the parser when available)"""
+
+    name = "soup"
+
+    def __init__(self, content_selectors=CONTENT_SELECTORS, footnote_selectors=FOOTNOTE_SELECTORS, parser=None):
+        from bs4 import BeautifulSoup, NavigableString, Comment
+
+        if parser is None:
+            try:
+                import lxml  # noqa: F401
+                parser = "lxml"
+            except ImportError:
+                parser = "html.parser"
+        self._soup = lambda html: BeautifulSoup(html, parser)
+        self._string_types = (NavigableString, Comment)
+        self._comment = Comment
+        self._content = content_selectors
+        self._footnotes = ", ".join(footnote_selectors)
+
+    def extract(self, html):
+        soup = self._soup(html)
+        for selector in self._content:
+            root = soup.select_one(selector)
+            if root:
+                break
+        else:
+            return None
+
+        footnotes = {id(node) for node in root.select(self._footnotes)}
+        collector = _Collector()
+        self._visit(root, collector, footnotes)
+        return collector.result()
+
+    def _visit(self, node, collector, footnotes):
+        if isinstance(node, self._string_types):
+            if not isinstance(node, self._comment):
+                collector.text(str(node))
+            return
+        if id(node) in footnotes:
+            collector.footnote(node.get_text())
+            return
+        if node.name in SKIP_TAGS:
+            return
+        block = node.name in BLOCK_TAGS
+        if block or node.name == "br":
+            collector.flush()
+        for child in node.children:
+            self._visit(child, collector, footnotes)
+        if block:
+            collector.flush()
+
+
+EXTRACTORS = {"lxml": LxmlExtractor, "soup": SoupExtractor}
+
+
+def lecture_text(entry):
+    """Text to index for a scraped lecture: the body (with [n] markers) followed by its numbered footnotes
+
+    Footnotes hold the citations, so they must reach the index even though "content" only keeps the markers."""
+    content = entry.get("content", "")
+    footnotes = entry.get("footnotes") or []
+    if not footnotes:
+        return content
+    return content + "\n\n" + "\n".join(f"[{note['id']}] {note['text']}" for note in footnotes)
+
+
+def get_extractor(name=None, **kwargs):
+    """Build the requested engine, or the fastest one installed (lxml, then BeautifulSoup)"""
+    if name is not None:
+        return EXTRACTORS[name](**kwargs)
+    try:
+        return LxmlExtractor(**kwargs)
+    except ImportError:
+        return SoupExtractor(**kwargs)
@@ -0,0 +1,53 @@
+import math
+import re
+from collections import Counter
+from typing import List, Sequence, Tuple
+
+from arabic_text import terms
+
+# تقسيم النص إلى جمل عند علامات الترقيم العربية واللاتينية وفواصل الأسطر
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?؟؛])\s*|\n+")
+MIN_SENTENCE_CHARS = 20
+MAX_SENTENCE_CHARS = 400
+# أفضلية خفيفة للمصادر الأعلى ترتيبًا في البحث
+RANK_DECAY = 0.15
+
+
+def split_sentences(text: str) -> List[str]:
+    sentences = []
+    for sentence in SENTENCE_SPLIT.split(text):
+        sentence = sentence.strip()
+        if len(sentence) >= MIN_SENTENCE_CHARS:
+            sentences.append(sentence[:MAX_SENTENCE_CHARS])
+    return sentences
+
+
+# ✅ إجابة استخلاصية محلية تُستخدم عندما يتأخر النموذج أو يفشل
+def extractive_answer(query: str, docs: Sequence, max_sentences: int = 3) -> Tuple[str, object]:
+    """اختيار الجمل الأكثر تطابقًا مع السؤال من المستندات المسترجعة؛ يُرجع النص والمستند الأهم"""
+    candidates = []
+    for rank, doc in enumerate(docs):
+        for position, sentence in enumerate(split_sentences(doc.page_content)):
+            candidates.append((rank, position, sentence, Counter(terms(sentence))))
+    if not candidates:
+        # لا توجد جمل بطول كافٍ: نعرض بداية الجزء الأعلى ترتيبًا بدل إجابة فارغة
+        if not docs:
+            return "", None
+        return f"- {docs[0].page_content.strip()[:MAX_SENTENCE_CHARS]}", docs[0]
+
+    query_terms = set(terms(query))
+    df = Counter(term for *_, counts in candidates for term in query_terms if term in counts)
+    idf = {term: math.log(1 + len(candidates) / (1 + df[term])) for term in query_terms}
+
+    def score(candidate):
+        rank, _, _, counts = candidate
+        overlap = sum(idf[term] for term in query_terms if term in counts)
+        return overlap / math.sqrt(1 + sum(counts.values())) * (1 - RANK_DECAY) ** rank
+
+    ranked = sorted(candidates, key=lambda c: (-score(c), c[0], c[1]))
+    if score(ranked[0]) <= 0:
+        # لا يوجد أي تطابق: نعرض بداية المصدر الأعلى ترتيبًا بدل جمل عشوائية
+        ranked = sorted(candidates, key=lambda c: (c[0], c[1]))
+
+    chosen = sorted(ranked[:max_sentences], key=lambda c: (c[0], c[1]))
+    return "\n".join(f"- {sentence}" for _, _, sentence, _ in chosen), docs[ranked[0][0]]
@@ -0,0 +1,384 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from array import array
+from typing import Dict, Iterator, Optional, Tuple
+
+from payload_store import PAYLOAD_DIR, PayloadStore, write_payload_store
+
+# تخطيط مخزن اللقطات: كائنات مُعنونة بالمحتوى + ملف manifest لكل إصدار
+SNAPSHOT_ROOT = "./snapshots"
+OBJECTS_DIR = "objects"
+MANIFESTS_DIR = "manifests"
+CHECKOUTS_DIR = "checkouts"
+CURRENT_LINK = "current"
+INGESTION_CONFIG_FILE = "ingestion_config.json"
+COLLECTION_METADATA_UNIT = "collection_metadata"
+
+# وحدات كل جزء: "vectors" متجه واحد لكل جزء نصي (float32)، و"payload" نصه وبياناته الوصفية،
+# و"config" إعدادات الإدخال وإعدادات المجموعة. ملفات Chroma نفسها لا تدخل اللقطة أبدًا:
+# sqlite يُعاد كتابته بالكامل في كل إدخال، بينما الوحدة لا تتغير ما لم يتغير الجزء نفسه
+SEGMENTS = ("vectors", "payload", "config")
+READ_BATCH = 5000
+
+
+# ✅ أدوات مساعدة للتجزئة والترميز
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _sha256_json(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _encode_json(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def _encode_vector(embedding) -> bytes:
+    # Chroma يخزن المتجهات float32، فالتحويل هنا لا يفقد أي دقة
+    return array("f", (float(x) for x in embedding)).tobytes()
+
+
+def _decode_vector(data: bytes):
+    vector = array("f")
+    vector.frombytes(data)
+    return vector.tolist()
+
+
+def _manifest_path(root: str, version: str) -> str:
+    return os.path.join(root, MANIFESTS_DIR, f"{version}.json")
+
+
+def _object_path(root: str, sha256: str) -> str:
+    return os.path.join(root, OBJECTS_DIR, sha256[:2], sha256)
+
+
+def _put_object(root: str, data: bytes) -> dict:
+    sha256 = hashlib.sha256(data).hexdigest()
+    path = _object_path(root, sha256)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return {"sha256": sha256, "size": len(data)}
+
+
+def _read_object(root: str, sha256: str) -> bytes:
+    with open(_object_path(root, sha256), "rb") as f:
+        return f.read()
+
+
+def _sequence_of(version: str) -> int:
+    return int(version.split("-", 1)[0])
+
+
+def write_ingestion_config(vector_store_dir: str, config: dict):
+    """حفظ إعدادات الإدخال داخل مجلد قاعدة المتجهات لتصبح جزءًا من اللقطة"""
+    with open(os.path.join(vector_store_dir, INGESTION_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def load_manifest(version: str, root: str = SNAPSHOT_ROOT) -> dict:
+    with open(_manifest_path(root, version), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def list_snapshots(root: str = SNAPSHOT_ROOT):
+    """قائمة الإصدارات مرتبة من الأقدم إلى الأحدث (الرقم التسلسلي جزء من اسم الإصدار)"""
+    manifests_dir = os.path.join(root, MANIFESTS_DIR)
+    if not os.path.isdir(manifests_dir):
+        return []
+    versions = [name[:-len(".json")] for name in os.listdir(manifests_dir) if name.endswith(".json")]
+    return sorted(versions, key=_sequence_of)
+
+
+def _mark_sequence(root: str, sequence: int, exclusive: bool):
+    flags = os.O_CREAT | os.O_WRONLY | (os.O_EXCL if exclusive else 0)
+    os.close(os.open(os.path.join(root, MANIFESTS_DIR, f".seq-{sequence:06d}"), flags))
+
+
+def _reserve_sequence(root: str) -> int:
+    """حجز رقم تسلسلي جديد؛ الإنشاء الحصري للملف يمنع لقطتين متزامنتين من أخذ الرقم نفسه
+
+    الرقم يتجاوز أيضًا كل إصدار موجود، بما فيها الإصدارات المستوردة من نسخة أخرى."""
+    manifests_dir = os.path.join(root, MANIFESTS_DIR)
+    os.makedirs(manifests_dir, exist_ok=True)
+    taken = [int(name[len(".seq-"):]) for name in os.listdir(manifests_dir) if name.startswith(".seq-")]
+    taken += [_sequence_of(version) for version in list_snapshots(root)]
+    sequence = max(taken, default=0) + 1
+    while True:
+        try:
+            _mark_sequence(root, sequence, exclusive=True)
+            return sequence
+        except FileExistsError:
+            sequence += 1
+
+
+# ✅ قراءة وحدات الفهرس من مجلد قاعدة المتجهات
+def _open_collection(vector_store_dir: str, collection_metadata: Optional[dict] = None):
+    from langchain_community.vectorstores import Chroma
+
+    return Chroma(persist_directory=vector_store_dir, collection_metadata=collection_metadata)._collection
+
+
+def _read_units(vector_store_dir: str) -> Iterator[Tuple[str, str, bytes]]:
+    """(الجزء، اسم الوحدة، محتواها) لكل جزء نصي في المجموعة، ثم وحدات الإعدادات"""
+    collection = _open_collection(vector_store_dir)
+    offset = 0
+    while True:
+        batch = collection.get(include=["embeddings", "documents", "metadatas"], limit=READ_BATCH, offset=offset)
+        if not len(batch["ids"]):
+            break
+        for chunk_id, embedding, text, metadata in zip(batch["ids"], batch["embeddings"], batch["documents"], batch["metadatas"]):
+            yield "vectors", chunk_id, _encode_vector(embedding)
+            yield "payload", chunk_id, _encode_json({"text": text, "metadata": metadata or {}})
+        offset += len(batch["ids"])
+
+    yield "config", COLLECTION_METADATA_UNIT, _encode_json(collection.metadata or {})
+    config_path = os.path.join(vector_store_dir, INGESTION_CONFIG_FILE)
+    if os.path.exists(config_path):
+        with open(config_path, "rb") as f:
+            yield "config", INGESTION_CONFIG_FILE, f.read()
+
+
+# ✅ إنشاء لقطة جديدة من مجلد قاعدة المتجهات
+def create_snapshot(vector_store_dir: str, root: str = SNAPSHOT_ROOT) -> str:
+    """تقسيم الفهرس إلى وحدات مُعنونة بالمحتوى لكل جزء نصي؛ الوحدات الموجودة مسبقًا لا تُكتب مرة أخرى"""
+    segments: Dict[str, Dict[str, dict]] = {name: {} for name in SEGMENTS}
+    for segment, unit, data in _read_units(vector_store_dir):
+        segments[segment][unit] = _put_object(root, data)
+
+    history = list_snapshots(root)
+    sequence = _reserve_sequence(root)
+    manifest = {
+        "parent": history[-1] if history else None,
+        "segments": {name: {"sha256": _sha256_json(units), "units": units} for name, units in segments.items()},
+    }
+    manifest["sequence"] = sequence
+    manifest["created"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    manifest["version"] = f"{sequence:06d}-{_sha256_json(manifest['segments'])[:8]}"
+
+    # manifest مضغوط: يضم مدخلًا لكل جزء نصي ويُرسل كاملًا مع كل تصدير
+    with open(_manifest_path(root, manifest["version"]), "x", encoding="utf-8") as f:
+        json.dump(manifest, f, sort_keys=True, separators=(",", ":"))
+    return manifest["version"]
+
+
+def _changed_objects(manifest: dict, base: Optional[dict]):
+    """الكائنات التي يحتاجها الإصدار ولا توجد في الإصدار الأساسي"""
+    base_hashes = set()
+    if base is not None:
+        for segment in base["segments"].values():
+            base_hashes.update(entry["sha256"] for entry in segment["units"].values())
+
+    changed = {}
+    for name, segment in manifest["segments"].items():
+        if base is not None and base["segments"].get(name, {}).get("sha256") == segment["sha256"]:
+            continue
+        for entry in segment["units"].values():
+            if entry["sha256"] not in base_hashes:
+                changed[entry["sha256"]] = entry["size"]
+    return changed
+
+
+# ✅ تصدير واستيراد الفروقات فقط
+def export_snapshot(version: str, out_dir: str, base_version: Optional[str] = None, root: str = SNAPSHOT_ROOT) -> int:
+    """تصدير manifest الإصدار مع الكائنات غير الموجودة في base_version؛ يُرجع حجم الفروقات بالبايت"""
+    manifest = load_manifest(version, root)
+    base = load_manifest(base_version, root) if base_version else None
+    changed = _changed_objects(manifest, base)
+
+    os.makedirs(os.path.join(out_dir, MANIFESTS_DIR), exist_ok=True)
+    shutil.copyfile(_manifest_path(root, version), _manifest_path(out_dir, version))
+    for sha256 in changed:
+        target = _object_path(out_dir, sha256)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(_object_path(root, sha256), target)
+    return sum(changed.values())
+
+
+def import_snapshot(bundle_dir: str, root: str = SNAPSHOT_ROOT):
+    """استيراد حزمة فروقات مع التحقق من تجزئة كل كائن، ورفضها إذا كانت ناقصة"""
+    imported = []
+    for name in sorted(os.listdir(os.path.join(bundle_dir, MANIFESTS_DIR))):
+        if not name.endswith(".json"):
+            continue
+        version = name[:-len(".json")]
+        manifest = load_manifest(version, bundle_dir)
+        for segment in manifest["segments"].values():
+            for unit, entry in segment["units"].items():
+                sha256 = entry["sha256"]
+                local = _object_path(root, sha256)
+                if os.path.exists(local):
+                    continue
+                incoming = _object_path(bundle_dir, sha256)
+                if not os.path.exists(incoming):
+                    raise FileNotFoundError(f"❌ الكائن {sha256} ({unit}) غير موجود في الحزمة ولا محليًا")
+                if _sha256_file(incoming) != sha256:
+                    raise ValueError(f"❌ تجزئة الكائن {sha256} ({unit}) غير مطابقة")
+                os.makedirs(os.path.dirname(local), exist_ok=True)
+                shutil.copyfile(incoming, local + ".tmp")
+                os.replace(local + ".tmp", local)
+
+        os.makedirs(os.path.join(root, MANIFESTS_DIR), exist_ok=True)
+        shutil.copyfile(_manifest_path(bundle_dir, version), _manifest_path(root, version))
+        # حجز رقمه محليًا حتى تأخذ اللقطة التالية هنا رقمًا أكبر منه
+        _mark_sequence(root, manifest["sequence"], exclusive=False)
+        imported.append(version)
+    return imported
+
+
+def verify_snapshot(version: str, root: str = SNAPSHOT_ROOT):
+    """التحقق من سلامة جميع الكائنات التي يشير إليها الإصدار"""
+    manifest = load_manifest(version, root)
+    for name, segment in manifest["segments"].items():
+        if _sha256_json(segment["units"]) != segment["sha256"]:
+            raise ValueError(f"❌ تجزئة الجزء {name} في الإصدار {version} غير مطابقة")
+        for unit, entry in segment["units"].items():
+            path = _object_path(root, entry["sha256"])
+            if not os.path.exists(path) or _sha256_file(path) != entry["sha256"]:
+                raise ValueError(f"❌ الوحدة {unit} في الإصدار {version} مفقودة أو تالفة")
+
+
+def verify_checkout(path: str, version: str, root: str = SNAPSHOT_ROOT):
+    """التحقق مما سيُخدم فعلًا (مجموعة Chroma ومخزن النصوص) مقابل manifest الإصدار"""
+    manifest = load_manifest(version, root)
+    served: Dict[str, Dict[str, str]] = {name: {} for name in SEGMENTS}
+    for segment, unit, data in _read_units(path):
+        served[segment][unit] = hashlib.sha256(data).hexdigest()
+    for name, segment in manifest["segments"].items():
+        expected = {unit: entry["sha256"] for unit, entry in segment["units"].items()}
+        mismatched = set(expected.items()) ^ set(served.get(name, {}).items())
+        if mismatched:
+            raise ValueError(f"❌ {len(mismatched)} وحدة من الجزء {name} في {path} لا تطابق الإصدار {version}")
+
+    payload_units = manifest["segments"]["payload"]["units"]
+    store = PayloadStore(os.path.join(path, PAYLOAD_DIR))
+    try:
+        if len(store) != len(payload_units):
+            raise ValueError(f"❌ مخزن النصوص في {path} يضم {len(store)} جزءًا بدل {len(payload_units)}")
+        for chunk_id, entry in payload_units.items():
+            index = store.index_of(chunk_id)
+            if index is None or store.text(index) != json.loads(_read_object(root, entry["sha256"]))["text"]:
+                raise ValueError(f"❌ الجزء {chunk_id} في مخزن النصوص لا يطابق الإصدار {version}")
+    finally:
+        store.close()
+
+
+# ✅ تفعيل إصدار للخدمة بتبديل ذري للرابط `current`
+def checkout_snapshot(version: str, root: str = SNAPSHOT_ROOT) -> str:
+    """بناء الإصدار في مجلد جديد في كل مرة والتحقق منه، ثم تحويل `current` إليه دفعة واحدة
+
+    المجموعة تُبنى محليًا من وحدات المتجهات (دون أي استدعاء لنموذج التضمين)، ومخزن النصوص
+    من وحدات النصوص. لا يُعاد استخدام نسخة سابقة أبدًا: Chroma يكتب داخل المجلد الذي يفتحه،
+    فالنسخة القديمة قد لا تطابق الإصدار بعد الآن، وقد تكون لا تزال مفتوحة لدى عمليات أخرى."""
+    verify_snapshot(version, root)
+    segments = load_manifest(version, root)["segments"]
+
+    checkouts_dir = os.path.join(root, CHECKOUTS_DIR)
+    os.makedirs(checkouts_dir, exist_ok=True)
+    target = os.path.abspath(tempfile.mkdtemp(dir=checkouts_dir, prefix=f"{version}."))
+
+    config = segments["config"]["units"]
+    if INGESTION_CONFIG_FILE in config:
+        with open(os.path.join(target, INGESTION_CONFIG_FILE), "wb") as f:
+            f.write(_read_object(root, config[INGESTION_CONFIG_FILE]["sha256"]))
+    collection_metadata = None
+    if COLLECTION_METADATA_UNIT in config:
+        collection_metadata = json.loads(_read_object(root, config[COLLECTION_METADATA_UNIT]["sha256"])) or None
+    collection = _open_collection(target, collection_metadata)
+
+    vectors, payload = segments["vectors"]["units"], segments["payload"]["units"]
+    chunk_ids = sorted(payload)
+    texts, metadatas = [], []
+    for start in range(0, len(chunk_ids), READ_BATCH):
+        batch = chunk_ids[start:start + READ_BATCH]
+        records = [json.loads(_read_object(root, payload[chunk_id]["sha256"])) for chunk_id in batch]
+        collection.add(
+            ids=batch,
+            embeddings=[_decode_vector(_read_object(root, vectors[chunk_id]["sha256"])) for chunk_id in batch],
+            documents=[record["text"] for record in records],
+            metadatas=[record["metadata"] or None for record in records],
+        )
+        texts.extend(record["text"] for record in records)
+        metadatas.extend(record["metadata"] for record in records)
+    write_payload_store(chunk_ids, texts, metadatas, os.path.join(target, PAYLOAD_DIR))
+    verify_checkout(target, version, root)
+
+    link = os.path.join(root, CURRENT_LINK)
+    tmp_link = link + ".tmp"
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(os.path.relpath(target, os.path.abspath(root)), tmp_link)
+    os.replace(tmp_link, link)
+    return target
+
+
+def active_vector_store_path(default: str = "./vector_store", root: str = SNAPSHOT_ROOT) -> str:
+    """المسار الذي يجب أن تقرأ منه الخدمة؛ يتغير فور تنفيذ checkout دون إعادة تشغيل"""
+    link = os.path.join(root, CURRENT_LINK)
+    if os.path.islink(link):
+        return os.path.realpath(link)
+    return default
+
+
+# ✅ تحليل المدخلات الخاصة بالبرنامج
+def get_parser():
+    parser = argparse.ArgumentParser(description="إدارة لقطات فهرس المتجهات")
+    parser.add_argument("--root", type=str, default=SNAPSHOT_ROOT, help="مجلد مخزن اللقطات")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser("create", help="إنشاء لقطة من مجلد قاعدة المتجهات")
+    create.add_argument("--vector_store", type=str, default="./vector_store")
+
+    export = commands.add_parser("export", help="تصدير الفروقات بين إصدارين")
+    export.add_argument("version")
+    export.add_argument("--base", type=str, default=None, help="الإصدار الموجود مسبقًا لدى المستقبل")
+    export.add_argument("--out", type=str, required=True)
+
+    import_ = commands.add_parser("import", help="استيراد حزمة فروقات")
+    import_.add_argument("bundle")
+
+    verify = commands.add_parser("verify", help="التحقق من سلامة إصدار")
+    verify.add_argument("version")
+
+    checkout = commands.add_parser("checkout", help="تفعيل إصدار للخدمة")
+    checkout.add_argument("version")
+
+    commands.add_parser("list", help="عرض الإصدارات المتاحة")
+    return parser
+
+
+def main():
+    args = get_parser().parse_args()
+
+    if args.command == "create":
+        print(f"✅ تم إنشاء اللقطة: {create_snapshot(args.vector_store, args.root)}")
+    elif args.command == "export":
+        size = export_snapshot(args.version, args.out, args.base, args.root)
+        print(f"✅ تم تصدير {args.version} إلى {args.out} (حجم الفروقات: {size / 1e6:.2f} MB)")
+    elif args.command == "import":
+        print(f"✅ تم استيراد: {', '.join(import_snapshot(args.bundle, args.root))}")
+    elif args.command == "verify":
+        verify_snapshot(args.version, args.root)
+        print(f"✅ الإصدار {args.version} سليم")
+    elif args.command == "checkout":
+        print(f"✅ الإصدار النشط الآن: {checkout_snapshot(args.version, args.root)}")
+    elif args.command == "list":
+        for version in list_snapshots(args.root):
+            print(version)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import argparse
+import csv
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from mock_openai import add_mock_arguments, config_from_args, start_mock_server
+from responses import OUTCOMES, response_outcome
+
+
+def load_questions(evaluation_csv="evaluation_dataset.csv"):
+    """تحميل أسئلة التقييم لإعادة تشغيلها كحمل"""
+    with open(evaluation_csv, "r", encoding="utf-8") as f:
+        return [row["Question"] for row in csv.DictReader(f)]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    # nearest-rank: أصغر قيمة تغطي pct% من العينات
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+# ✅ أهداف الاختبار: الدالة مباشرة أو تطبيق Gradio عبر HTTP (كل هدف يُرجع نص الرد)
+def function_target():
+    from chatbot import generate_response  # بعد ضبط متغيرات البيئة الخاصة بالخادم الوهمي
+
+    return lambda question: generate_response(question)
+
+
+def gradio_target(url):
+    from gradio_client import Client
+
+    local = threading.local()
+
+    def call(question):
+        if not hasattr(local, "client"):
+            local.client = Client(url, verbose=False)
+        history, _ = local.client.predict(question, [], api_name="/chat_with_bot")
+        return history[-1][1]
+
+    return call
+
+
+def run_load(target, questions, total_requests, concurrency, rate=None, seed=0, mock_config=None):
+    """تشغيل الحمل: حلقة مغلقة بعدد ثابت من العملاء، أو وصول Poisson بمعدل `rate` طلب/ثانية
+
+    الإنتاجية والزمن تُحسب للإجابات الكاملة فقط؛ الإجابات الاستخلاصية ورسائل الخطأ تُعدّ بشكل منفصل."""
+    if mock_config is not None:
+        mock_config.take_stats()
+    rng = random.Random(seed)
+    latencies, errors, outcomes = [], Counter(), Counter({outcome: 0 for outcome in OUTCOMES})
+    lock = threading.Lock()
+
+    def one_request(question, arrived=None):
+        # في وضع الوصول المفتوح يُحسب الزمن من لحظة الوصول (يشمل الانتظار في الطابور)
+        start = arrived if arrived is not None else time.perf_counter()
+        try:
+            outcome = response_outcome(target(question))
+        except Exception as e:
+            with lock:
+                errors[type(e).__name__] += 1
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            outcomes[outcome] += 1
+            if outcome == "ok":
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = []
+        for _ in range(total_requests):
+            if rate:
+                time.sleep(rng.expovariate(rate))
+                futures.append(pool.submit(one_request, rng.choice(questions), time.perf_counter()))
+            else:
+                futures.append(pool.submit(one_request, rng.choice(questions)))
+        wait(futures)
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    failed = sum(errors.values()) + outcomes["error"]
+    result = {
+        "concurrency": concurrency,
+        "rate": rate,
+        "requests": total_requests,
+        "duration_s": duration,
+        "throughput_rps": len(latencies) / duration if duration else 0.0,
+        "error_rate": failed / total_requests if total_requests else 0.0,
+        "fallback_rate": outcomes["fallback"] / total_requests if total_requests else 0.0,
+        "outcomes": dict(outcomes),
+        "errors": dict(errors),
+        "p50_ms": percentile(latencies, 50),
+        "p90_ms": percentile(latencies, 90),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": latencies[-1] if latencies else 0.0,
+    }
+    if mock_config is not None:
+        # أخطاء الخادم الوهمي قد يمتصها الطلب الموازي أو الإجابة الاستخلاصية؛ نعرضها هنا بشكل منفصل
+        upstream = mock_config.take_stats()
+        injected = upstream.get("embedding_errors", 0) + upstream.get("chat_errors", 0)
+        result["upstream"] = upstream
+        result["upstream_error_rate"] = injected / max(1, upstream.get("embedding_requests", 0) + upstream.get("chat_requests", 0))
+        result["absorbed_errors"] = max(0, injected - failed)
+    return result
+
+
+def print_report(results):
+    print(f"\n{'conc':>5} {'rate':>6} {'rps':>7} {'err%':>6} {'fb%':>6} {'p50':>8} {'p90':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for r in results:
+        rate = f"{r['rate']:.1f}" if r["rate"] else "-"
+        print(f"{r['concurrency']:>5} {rate:>6} {r['throughput_rps']:>7.2f} {100 * r['error_rate']:>6.1f} "
+              f"{100 * r['fallback_rate']:>6.1f} "
+              f"{r['p50_ms']:>8.0f} {r['p90_ms']:>8.0f} {r['p95_ms']:>8.0f} {r['p99_ms']:>8.0f} {r['max_ms']:>8.0f}")
+        if r["errors"] or r["outcomes"]["error"]:
+            print(f"      ❌ {r['errors']}, retrieval errors: {r['outcomes']['error']}")
+        if "upstream" in r:
+            print(f"      🧪 upstream {r['upstream']} → upstream err {100 * r['upstream_error_rate']:.1f}%, "
+                  f"up to {r['absorbed_errors']} injected errors absorbed by hedging or the extractive fallback")
+
+    # نقطة التشبع: أول مستوى لا يزيد فيه الإنتاج بأكثر من 10% عن المستوى السابق
+    for previous, current in zip(results, results[1:]):
+        if current["throughput_rps"] < previous["throughput_rps"] * 1.1:
+            print(f"\n📈 التشبع تقريبًا عند concurrency={previous['concurrency']} "
+                  f"({previous['throughput_rps']:.2f} طلب/ثانية)")
+            break
+
+
+# ✅ تحليل المدخلات الخاصة بالبرنامج
+def get_parser():
+    parser = argparse.ArgumentParser(description="اختبار حمل للشات بوت بأسئلة evaluation_dataset.csv")
+    parser.add_argument("--target", choices=["function", "gradio"], default="function")
+    parser.add_argument("--url", type=str, default="http://127.0.0.1:7860", help="عنوان تطبيق Gradio")
+    parser.add_argument("--evaluation_csv", type=str, default="evaluation_dataset.csv")
+    parser.add_argument("--requests", type=int, default=100, help="عدد الطلبات لكل مستوى")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 2, 4, 8, 16],
+                        help="مستويات التزامن (تُنفذ بالترتيب لإيجاد نقطة التشبع)")
+    parser.add_argument("--rate", type=float, default=None, help="معدل وصول Poisson (طلب/ثانية) بدل الحلقة المغلقة")
+    parser.add_argument("--mock", action="store_true", help="تشغيل خادم OpenAI وهمي محليًا وتوجيه الطلبات إليه")
+    parser.add_argument("--report", type=str, default=None, help="حفظ النتائج في ملف JSON")
+    return add_mock_arguments(parser)
+
+
+def main():
+    args = get_parser().parse_args()
+
+    mock_config = None
+    if args.mock:
+        mock_config = config_from_args(args)
+        _, base_url = start_mock_server(mock_config)
+        os.environ["OPENAI_API_BASE"] = base_url
+        os.environ["OPENAI_BASE_URL"] = base_url
+        os.environ.setdefault("OPENAI_API_KEY", "sk-mock")
+        print(f"🧪 خادم OpenAI الوهمي: {base_url}")
+        if args.target == "gradio":
+            print("⚠️ يجب تشغيل app.py بنفس متغيرات البيئة ليستخدم الخادم الوهمي.")
+
+    target = function_target() if args.target == "function" else gradio_target(args.url)
+    questions = load_questions(args.evaluation_csv)
+
+    results = []
+    for concurrency in args.concurrency:
+        print(f"🚀 concurrency={concurrency}, requests={args.requests}, rate={args.rate or 'closed-loop'}")
+        results.append(run_load(target, questions, args.requests, concurrency, args.rate, mock_config=mock_config))
+    print_report(results)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 تم حفظ التقرير في {args.report}")
+
+
+if __name__ == "__main__":
+    main()
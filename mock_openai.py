@@ -0,0 +1,165 @@
+import argparse
+import base64
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# بُعد متجهات text-embedding-ada-002 (يجب أن يطابق الفهرس)
+EMBEDDING_DIM = 1536
+MOCK_ANSWER = "هذه إجابة تجريبية من الخادم الوهمي لاختبار الأداء، وهي مستخلصة من المعلومات المسترجعة."
+
+
+class MockConfig:
+    """إعدادات الخادم الوهمي: زمن الاستجابة والتذبذب ونسبة الأخطاء لكل نوع طلب"""
+
+    def __init__(self, embedding_latency_ms=50.0, chat_latency_ms=800.0, jitter_ms=100.0,
+                 error_rate=0.0, error_status=500, seed=None):
+        self.embedding_latency_ms = embedding_latency_ms
+        self.chat_latency_ms = chat_latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = Counter()  # طلبات وأخطاء كل نوع كما وصلت إلى الخادم (تشمل إعادة المحاولات)
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def take_stats(self):
+        """إرجاع العدادات منذ آخر استدعاء ثم تصفيرها"""
+        with self.lock:
+            stats, self.stats = dict(self.stats), Counter()
+        return stats
+
+    def delay(self, base_ms):
+        with self.lock:
+            jitter = self.rng.uniform(-self.jitter_ms, self.jitter_ms)
+        time.sleep(max(0.0, base_ms + jitter) / 1000)
+
+    def should_fail(self):
+        with self.lock:
+            return self.rng.random() < self.error_rate
+
+
+def fake_embedding(item):
+    """متجه ثابت لكل مدخل (نص أو قائمة رموز) حتى تكون النتائج قابلة للتكرار"""
+    seed = hashlib.sha256(json.dumps(item, ensure_ascii=False).encode("utf-8")).digest()
+    rng = random.Random(seed)
+    vector = [rng.gauss(0, 1) for _ in range(EMBEDDING_DIM)]
+    norm = sum(x * x for x in vector) ** 0.5
+    return [x / norm for x in vector]
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    config: MockConfig = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.path.endswith("/embeddings"):
+            kind = "embedding"
+            self.config.delay(self.config.embedding_latency_ms)
+            handler = self._embeddings
+        elif self.path.endswith("/chat/completions"):
+            kind = "chat"
+            self.config.delay(self.config.chat_latency_ms)
+            handler = self._chat_completion
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+
+        self.config.count(f"{kind}_requests")
+        if self.config.should_fail():
+            self.config.count(f"{kind}_errors")
+            self._send_json(self.config.error_status, {"error": {"message": "Injected failure", "type": "server_error"}})
+            return
+        self._send_json(200, handler(request))
+
+    def _embeddings(self, request):
+        inputs = request.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+
+        data = []
+        for index, item in enumerate(inputs):
+            vector = fake_embedding(item)
+            # عميل openai يطلب base64 افتراضيًا
+            if request.get("encoding_format") == "base64":
+                vector = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+        return {"object": "list", "data": data, "model": request.get("model", "mock"),
+                "usage": {"prompt_tokens": 0, "total_tokens": 0}}
+
+    def _chat_completion(self, request):
+        return {
+            "id": f"chatcmpl-mock-{time.time_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": MOCK_ANSWER}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+
+def start_mock_server(config: MockConfig, host="127.0.0.1", port=0):
+    """تشغيل الخادم في خيط خلفي؛ يُرجع الخادم وعنوان `/v1` الخاص به"""
+    handler = type("ConfiguredMockOpenAIHandler", (MockOpenAIHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+# ✅ تحليل المدخلات الخاصة بالبرنامج
+def add_mock_arguments(parser):
+    parser.add_argument("--embedding_latency_ms", type=float, default=50.0)
+    parser.add_argument("--chat_latency_ms", type=float, default=800.0)
+    parser.add_argument("--jitter_ms", type=float, default=100.0)
+    parser.add_argument("--error_rate", type=float, default=0.0, help="نسبة الطلبات التي تفشل عمدًا (0-1)")
+    parser.add_argument("--error_status", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=None)
+    return parser
+
+
+def config_from_args(args):
+    return MockConfig(args.embedding_latency_ms, args.chat_latency_ms, args.jitter_ms,
+                      args.error_rate, args.error_status, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="خادم OpenAI وهمي (embeddings + chat) لاختبار الأداء")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    args = add_mock_arguments(parser).parse_args()
+
+    server, base_url = start_mock_server(config_from_args(args), args.host, args.port)
+    print(f"✅ الخادم الوهمي يعمل على {base_url}")
+    print(f"📌 استخدم: OPENAI_API_BASE={base_url} OPENAI_BASE_URL={base_url} OPENAI_API_KEY=sk-mock")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence
+
+# الحقول الوصفية التي نحتاجها عند الاسترجاع (بقية الـ metadata لا تُقرأ أبدًا)
+# `also_in`: روابط المحاضرات الأخرى التي تحتوي على نفس الجزء بعد إزالة التكرار
+PAYLOAD_FIELDS = ("title", "url", "category", "path", "also_in")
+PAYLOAD_DIR = "payload"
+
+TEXT_FILE = "texts.bin"
+OFFSETS_FILE = "offsets.bin"
+STRINGS_FILE = "strings.json"
+
+
+def _codes_file(field: str) -> str:
+    return f"{field}.codes"
+
+
+def content_chunk_ids(documents, url_key: str = "url") -> List[str]:
+    """معرفات ثابتة مشتقة من المحتوى (الرابط + ترتيب الجزء داخل المحاضرة + النص)
+
+    إعادة الإدخال على نفس البيانات تُنتج نفس المعرفات، فلا يتغير المخزن ولا الفهرس بلا سبب."""
+    ids = []
+    seen: Dict[str, int] = {}
+    for doc in documents:
+        url = str(doc.metadata.get(url_key, ""))
+        index = seen.get(url, 0)
+        seen[url] = index + 1
+        ids.append(hashlib.sha256(f"{url}\n{index}\n{doc.page_content}".encode("utf-8")).hexdigest()[:32])
+    return ids
+
+
+# ✅ كتابة مخزن النصوص المضغوط أثناء الإدخال
+def write_payload_store(ids: Sequence[str], texts: Sequence[str], metadatas: Sequence[dict], store_dir: str):
+    """كتابة النصوص في ملف UTF-8 واحد مع جدول إزاحات، والحقول الوصفية كأرقام تشير إلى جداول نصوص مُوحَّدة
+
+    كل كتابة تُنشئ جيلًا جديدًا في مجلد خاص بها، و`store_dir` رابط رمزي يُحوَّل إليه دفعة واحدة."""
+    parent, name = os.path.split(os.path.abspath(store_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=f"{name}.", suffix=".store")
+
+    offsets = array("q", [0])
+    with open(os.path.join(tmp_dir, TEXT_FILE), "wb") as f:
+        for text in texts:
+            encoded = (text or "").encode("utf-8")
+            f.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+    with open(os.path.join(tmp_dir, OFFSETS_FILE), "wb") as f:
+        offsets.tofile(f)
+
+    tables = {}
+    for field in PAYLOAD_FIELDS:
+        interned: Dict[str, int] = {}
+        codes = array("i")
+        for metadata in metadatas:
+            value = str((metadata or {}).get(field, ""))
+            codes.append(interned.setdefault(value, len(interned)))
+        with open(os.path.join(tmp_dir, _codes_file(field)), "wb") as f:
+            codes.tofile(f)
+        tables[field] = list(interned)
+
+    with open(os.path.join(tmp_dir, STRINGS_FILE), "w", encoding="utf-8") as f:
+        json.dump({"ids": list(ids), "fields": tables}, f, ensure_ascii=False)
+
+    # تبديل ذري للرابط: القارئ يرى الجيل القديم كاملًا أو الجديد كاملًا، ولا يرى المسار مفقودًا أبدًا
+    previous = os.path.realpath(store_dir) if os.path.islink(store_dir) else None
+    if os.path.isdir(store_dir) and previous is None:
+        # مخزن قديم مكتوب كمجلد عادي: يُنقل جانبًا مرة واحدة ليحل الرابط محله
+        previous = tempfile.mkdtemp(dir=parent, prefix=f"{name}.", suffix=".old")
+        os.replace(store_dir, previous)
+    tmp_link = f"{tmp_dir}.link"
+    os.symlink(os.path.basename(tmp_dir), tmp_link)
+    try:
+        os.replace(tmp_link, store_dir)
+    except OSError:
+        os.remove(tmp_link)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    # القرّاء يحلّون الرابط مرة واحدة ويُبقون ملفاتهم مفتوحة عبر mmap، فحذف الجيل السابق آمن لهم
+    if previous is not None and previous != os.path.realpath(store_dir):
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+def build_payload_store_from_chroma(db, store_dir: str):
+    """بناء مخزن النصوص من مجموعة Chroma موجودة (قراءة واحدة من sqlite لفهرس قديم)"""
+    data = db.get(include=["documents", "metadatas"])
+    write_payload_store(data["ids"], data["documents"], data["metadatas"], store_dir)
+
+
+class PayloadChunk:
+    """مرجع خفيف إلى جزء داخل المخزن؛ النص والحقول تُقرأ من الذاكرة المُعيَّنة عند الطلب فقط"""
+
+    __slots__ = ("_store", "index")
+
+    def __init__(self, store: "PayloadStore", index: int):
+        self._store = store
+        self.index = index
+
+    @property
+    def chunk_id(self) -> str:
+        return self._store.ids[self.index]
+
+    @property
+    def page_content(self) -> str:
+        return self._store.text(self.index)
+
+    @property
+    def title(self) -> str:
+        return self._store.field(self.index, "title")
+
+    @property
+    def url(self) -> str:
+        return self._store.field(self.index, "url")
+
+    @property
+    def category(self) -> str:
+        return self._store.field(self.index, "category")
+
+    @property
+    def path(self) -> str:
+        return self._store.field(self.index, "path")
+
+    @property
+    def also_in(self) -> List[str]:
+        value = self._store.field(self.index, "also_in")
+        return value.split(" | ") if value else []
+
+    def __repr__(self):
+        return f"PayloadChunk({self.chunk_id!r})"
+
+
+# ✅ قراءة المخزن عبر mmap لمشاركة نسخة واحدة من النصوص بين العمليات عبر page cache
+class PayloadStore:
+    def __init__(self, store_dir: str):
+        # حل الرابط مرة واحدة حتى تأتي كل الملفات من الجيل نفسه حتى لو بُدِّل أثناء الفتح
+        self.store_dir = os.path.realpath(store_dir)
+        with open(os.path.join(self.store_dir, STRINGS_FILE), "r", encoding="utf-8") as f:
+            strings = json.load(f)
+        self.ids: List[str] = strings["ids"]
+        self._tables: Dict[str, List[str]] = strings["fields"]
+        self._index_of: Dict[str, int] = {chunk_id: idx for idx, chunk_id in enumerate(self.ids)}
+
+        self._maps = []
+        self._text = self._map(TEXT_FILE)
+        self._offsets = self._map(OFFSETS_FILE).cast("q")
+        # المخازن المكتوبة قبل إضافة حقل ما تُرجع قيمة فارغة له
+        self._codes = {field: self._map(_codes_file(field)).cast("i") for field in self._tables}
+
+    def _map(self, name: str) -> memoryview:
+        with open(os.path.join(self.store_dir, name), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b"")
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return memoryview(mapped)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def index_of(self, chunk_id: str) -> Optional[int]:
+        return self._index_of.get(chunk_id)
+
+    def text(self, index: int) -> str:
+        return str(self._text[self._offsets[index]:self._offsets[index + 1]], "utf-8")
+
+    def field(self, index: int, name: str) -> str:
+        if name not in self._codes:
+            return ""
+        return self._tables[name][self._codes[name][index]]
+
+    def get(self, chunk_id: str) -> Optional[PayloadChunk]:
+        index = self._index_of.get(chunk_id)
+        return None if index is None else PayloadChunk(self, index)
+
+    def get_many(self, chunk_ids: Iterable[str]) -> List[PayloadChunk]:
+        """تحويل معرفات Chroma إلى مراجع خفيفة مع الحفاظ على ترتيب الاسترجاع"""
+        chunks = []
+        missing = 0
+        for chunk_id in chunk_ids:
+            index = self._index_of.get(chunk_id)
+            if index is None:
+                missing += 1
+            else:
+                chunks.append(PayloadChunk(self, index))
+        if missing:
+            logging.warning(f"⚠️ {missing} retrieved chunk ids are missing from the payload store ({self.store_dir})")
+        return chunks
+
+    def close(self):
+        self._text.release()
+        self._offsets.release()
+        for codes in self._codes.values():
+            codes.release()
+        for mapped in self._maps:
+            mapped.close()
+        self._maps = []
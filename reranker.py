@@ -0,0 +1,80 @@
+import math
+import os
+from collections import Counter
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+from arabic_text import terms
+
+# عدد الأجزاء التي تصل إلى الـ Prompt بعد إعادة الترتيب
+RERANK_TOP_N = 4
+# الاحتفاظ فقط بالأجزاء التي تبلغ درجتها هذه النسبة من درجة أفضل جزء
+RERANK_RELATIVE_THRESHOLD = 0.35
+# درجة Cross-Encoder الدنيا (بعد sigmoid)
+CROSS_ENCODER_THRESHOLD = 0.2
+CROSS_ENCODER_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+# ✅ مُقيِّم معجمي (BM25 على مجموعة المرشحين فقط) لا يحتاج أي نموذج
+def lexical_scores(query: str, texts: Sequence[str]) -> List[float]:
+    query_terms = set(terms(query))
+    docs = [Counter(terms(text)) for text in texts]
+    if not query_terms or not docs:
+        return [0.0] * len(texts)
+
+    avg_len = sum(sum(doc.values()) for doc in docs) / len(docs) or 1.0
+    idf = {}
+    for term in query_terms:
+        df = sum(1 for doc in docs if term in doc)
+        idf[term] = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+
+    scores = []
+    for doc in docs:
+        doc_len = sum(doc.values())
+        score = 0.0
+        for term in query_terms:
+            tf = doc.get(term, 0)
+            if not tf:
+                continue
+            score += idf[term] * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * doc_len / avg_len))
+        scores.append(score)
+    return scores
+
+
+# ✅ Cross-Encoder محلي على المعالج (اختياري: يُفعَّل بـ RERANKER=cross-encoder)
+@lru_cache(maxsize=1)
+def load_cross_encoder(model_name: str = CROSS_ENCODER_MODEL):
+    from sentence_transformers import CrossEncoder
+
+    return CrossEncoder(model_name, device="cpu")
+
+
+def cross_encoder_scores(query: str, texts: Sequence[str]) -> List[float]:
+    model = load_cross_encoder(os.getenv("RERANKER_MODEL", CROSS_ENCODER_MODEL))
+    logits = model.predict([(query, text) for text in texts], batch_size=len(texts) or 1)
+    return [1 / (1 + math.exp(-float(logit))) for logit in logits]
+
+
+def rerank(query: str, docs: Sequence, top_n: int = RERANK_TOP_N) -> List[Tuple[object, float]]:
+    """إعادة ترتيب المستندات المسترجعة وإرجاع أفضلها فقط فوق عتبة الصلة (جزء واحد على الأقل)"""
+    if not docs:
+        return []
+    texts = [doc.page_content for doc in docs]
+
+    if os.getenv("RERANKER", "lexical") == "cross-encoder":
+        scores = cross_encoder_scores(query, texts)
+        threshold = CROSS_ENCODER_THRESHOLD
+    else:
+        scores = lexical_scores(query, texts)
+        if max(scores) <= 0:
+            # لا توجد أي كلمة مشتركة (صياغة مختلفة أو مرادفات): لا إشارة معجمية، فنعتمد ترتيب البحث المتجهي
+            return [(doc, 0.0) for doc in docs[:top_n]]
+        threshold = RERANK_RELATIVE_THRESHOLD * max(scores)
+
+    # عند التساوي يبقى ترتيب البحث المتجهي هو الحَكَم
+    ranked = sorted(zip(docs, scores, range(len(docs))), key=lambda item: (-item[1], item[2]))
+    kept = [(doc, score) for doc, score, _ in ranked[:top_n] if score > 0 and score >= threshold]
+    return kept or [(ranked[0][0], ranked[0][1])]
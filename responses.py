@@ -0,0 +1,17 @@
+from typing import Tuple
+
+# الرسائل الثابتة التي يُرجعها الشات بوت بدل إجابة كاملة، ليصنّف اختبار الحمل الردود دون تخمين
+RETRIEVAL_ERROR_MESSAGE = "❌ تعذّر الوصول إلى قاعدة البيانات حاليًا، يُرجى المحاولة لاحقًا."
+FALLBACK_HEADING = "📖 **مقتطفات من المصادر (تعذّر توليد إجابة في الوقت المحدد):**"
+
+# ok: إجابة عادية (بما فيها رفض السؤال غير الفقهي)، fallback: إجابة استخلاصية بعد فشل النموذج،
+# error: تعذّر الاسترجاع
+OUTCOMES: Tuple[str, ...] = ("ok", "fallback", "error")
+
+
+def response_outcome(response: str) -> str:
+    if response == RETRIEVAL_ERROR_MESSAGE:
+        return "error"
+    if FALLBACK_HEADING in response:
+        return "fallback"
+    return "ok"
@@ -1,11 +1,11 @@
 import time
 import json
 import requests
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from extraction import get_extractor
 
 # Base page
 BASE_URL = "https://dorar.net/feqhia"
@@ -19,6 +19,9 @@ TARGET_CATEGORIES = ["كتابُ الزَّكاةِ" , "كتابُ الصَّو
 # Track expanded elements to avoid duplicate clicks
 expanded_sections = set()
 
+# HTML extraction engine (lxml when installed), built once with precompiled selectors
+extractor = get_extractor()
+
 # Headers for requests
 HEADERS = {
     "User-Agent": (
@@ -30,24 +33,25 @@ HEADERS = {
 
 def fetch_lecture_text(url):
     """
-    Fetches lecture text using requests instead of Selenium.
+    Fetches a lecture using requests instead of Selenium.
+    Returns the text with paragraph breaks plus the paragraphs and footnotes as separate fields.
     """
     try:
         resp = requests.get(url, headers=HEADERS, timeout=10)
         resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "html.parser")
 
-        # Try different selectors in case the structure changes
-        possible_selectors = ["div.w-100.mt-4", "div.card-text", "div.content"]
-        for selector in possible_selectors:
-            main_text_div = soup.select_one(selector)
-            if main_text_div:
-                return main_text_div.get_text(strip=True)
+        # The extractor tries several selectors in case the structure changes
+        lecture = extractor.extract(resp.text)
+        if lecture:
+            return lecture
 
-        return "Lecture content not found."
+        return {"text": "Lecture content not found.", "paragraphs": [], "footnotes": []}
 
     except requests.exceptions.RequestException as e:
-        return f"Error fetching lecture: {str(e)}"
+        return {"text": f"Error fetching lecture: {str(e)}", "paragraphs": [], "footnotes": []}
+    except Exception as e:
+        # Malformed pages must not abort the whole category crawl
+        return {"text": f"Error extracting lecture: {str(e)}", "paragraphs": [], "footnotes": []}
 
 
 def expand_and_collect_links(driver, li_element, path_so_far):
@@ -89,7 +93,9 @@ def expand_and_collect_links(driver, li_element, path_so_far):
             collected.setdefault(section, []).append({
                 "lecture_title": title,
                 "lecture_url": href,
-                "content": lecture_content,
+                "content": lecture_content["text"],
+                "paragraphs": lecture_content["paragraphs"],
+                "footnotes": lecture_content["footnotes"],
                 "path": " > ".join(path_so_far)
             })
 
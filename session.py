@@ -0,0 +1,130 @@
+import math
+import operator
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import List, Optional, Sequence, Tuple
+
+from arabic_text import terms, tokenize
+
+# حدود الذاكرة ومدة صلاحية الجلسات
+SESSION_TTL_S = 30 * 60
+MAX_SESSIONS = 500
+MAX_TURNS = 5
+MAX_POOL_CHUNKS = 60
+
+# إعدادات البحث داخل مجموعة الجلسة قبل الرجوع إلى الفهرس العام:
+# متجهات ada-002 تتركز في نطاق ضيق (0.7-1.0)، لذا نقارن بأفضل درجة حصل عليها آخر استرجاع
+# بدل عتبة ثابتة، ونقبل مجموعة الجلسة فقط إذا لم تنخفض عنها بأكثر من هذا الهامش
+POOL_SCORE_MARGIN = 0.03
+POOL_MIN_HITS = 3
+
+# السؤال التابع: يبدأ بأداة عطف/استئناف، أو لا يحتوي على أي كلمة موضوعية خاصة به
+# (الكلمات بعد التطبيع في arabic_text)
+FOLLOW_UP_OPENERS = {"وما", "وماذا", "وهل", "وكيف", "ومتي", "ولماذا", "ومن", "واذا", "ولو", "وايضا"}
+FOLLOW_UP_OPENING_PHRASES = (("ماذا", "عن"),)
+REFERENCE_TERMS = {
+    "دليل", "ادله", "حكم", "حكمه", "حكمها", "قول", "اقوال", "تفصيل", "سبب", "شروطه", "شروطها",
+    "ايضا", "فيه", "فيها", "عنه", "عنها", "له", "لها",
+}
+
+
+def _normalize(vector: Sequence[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def _dot(a: Sequence[float], b: Sequence[float]) -> float:
+    return sum(map(operator.mul, a, b))
+
+
+# ✅ حالة المحادثة لكل مستخدم
+class Session:
+    __slots__ = ("turns", "pool", "topic_query", "last_access", "lock")
+
+    def __init__(self):
+        self.turns = deque(maxlen=MAX_TURNS)  # (query, chunk_ids, top_score)
+        self.pool = OrderedDict()  # chunk_id -> normalized embedding
+        self.topic_query = None
+        self.last_access = time.monotonic()
+        # طابور Gradio قد يشغّل طلبين من الجلسة نفسها معًا (إرسال مزدوج مثلًا)
+        self.lock = threading.Lock()
+
+    def is_follow_up(self, query: str) -> bool:
+        if self.topic_query is None:
+            return False
+        tokens = tokenize(query)
+        if not tokens:
+            return False
+        if tokens[0] in FOLLOW_UP_OPENERS or any(tuple(tokens[:len(p)]) == p for p in FOLLOW_UP_OPENING_PHRASES):
+            return True
+        return not [term for term in terms(query) if term not in REFERENCE_TERMS]
+
+    def rewrite(self, query: str) -> Tuple[str, bool]:
+        """توسيع السؤال التابع بموضوع آخر سؤال مستقل، دون أي استدعاء للنموذج"""
+        if self.is_follow_up(query):
+            return f"{self.topic_query} {query}", True
+        return query, False
+
+    def search_pool(self, query_embedding: Sequence[float], top_k: int) -> List[str]:
+        """البحث في أجزاء الأدوار السابقة؛ يُرجع قائمة فارغة إذا لم تكن كافية للإجابة"""
+        query_embedding = _normalize(query_embedding)
+        with self.lock:
+            if not self.turns:
+                return []
+            min_score = self.turns[-1][2] - POOL_SCORE_MARGIN
+            scored = [(_dot(query_embedding, emb), chunk_id) for chunk_id, emb in self.pool.items()]
+        hits = [chunk_id for score, chunk_id in sorted(scored, reverse=True)[:top_k] if score >= min_score]
+        return hits if len(hits) >= POOL_MIN_HITS else []
+
+    def record(self, query: str, follow_up: bool, chunk_ids: Sequence[str], query_embedding: Sequence[float],
+               embeddings: Optional[Sequence] = None):
+        """حفظ الدور مع أفضل درجة تشابه حصل عليها، لتكون مرجع المعايرة للسؤال التالي"""
+        query_embedding = _normalize(query_embedding)
+        with self.lock:
+            if not follow_up:
+                self.topic_query = query
+            for chunk_id, embedding in zip(chunk_ids, embeddings if embeddings is not None else []):
+                if chunk_id in self.pool:
+                    self.pool.move_to_end(chunk_id)
+                else:
+                    self.pool[chunk_id] = _normalize([float(x) for x in embedding])
+
+            scores = [_dot(query_embedding, self.pool[chunk_id]) for chunk_id in chunk_ids if chunk_id in self.pool]
+            self.turns.append((query, list(chunk_ids), max(scores, default=0.0)))
+            while len(self.pool) > MAX_POOL_CHUNKS:
+                self.pool.popitem(last=False)
+
+
+# ✅ مخزن الجلسات مع انتهاء الصلاحية وحد أقصى للعدد (الأقدم استخدامًا يُحذف أولًا)
+class SessionStore:
+    def __init__(self, ttl_s: float = SESSION_TTL_S, max_sessions: int = MAX_SESSIONS):
+        self.ttl_s = ttl_s
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Session:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.pop(session_id, None) or Session()
+            session.last_access = now
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
+
+    def drop(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _expire(self, now: float):
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_access < self.ttl_s:
+                break
+            self._sessions.popitem(last=False)
+
+    def __len__(self):
+        return len(self._sessions)
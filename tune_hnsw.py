@@ -0,0 +1,160 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import time
+
+import hnswlib
+import numpy as np
+from langchain_openai import OpenAIEmbeddings
+
+from chatbot import load_vector_store
+
+# ملف إعدادات المجموعة الذي يقرأه `embedding_script.py` عند بناء الفهرس
+COLLECTION_CONFIG_FILE = "collection_config.json"
+
+# إعدادات Chroma الافتراضية، للمقارنة في التقرير
+CHROMA_DEFAULTS = {"hnsw:space": "l2", "hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 10}
+
+
+def load_questions(evaluation_csv="evaluation_dataset.csv", sample_size=200, seed=0):
+    """تحميل عينة من أسئلة التقييم لاستخدامها كاستعلامات"""
+    with open(evaluation_csv, "r", encoding="utf-8") as f:
+        questions = [row["Question"] for row in csv.DictReader(f)]
+    random.Random(seed).shuffle(questions)
+    return questions[:sample_size]
+
+
+def load_corpus_embeddings(vector_store_path="./vector_store"):
+    """قراءة المتجهات المخزنة في المجموعة الحالية (بدون إعادة حسابها)"""
+    db = load_vector_store(vector_store_path)
+    data = db._collection.get(include=["embeddings"])
+    return db, np.asarray(data["embeddings"], dtype=np.float32)
+
+
+# ✅ البحث الشامل الدقيق كمرجع لحساب recall
+def exact_neighbors(corpus, queries, k):
+    corpus_norm = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+    queries_norm = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = queries_norm @ corpus_norm.T
+    top = np.argpartition(-scores, k, axis=1)[:, :k]
+    return [set(row) for row in top]
+
+
+def evaluate_candidate(index, queries, truth, k, search_ef):
+    """قياس recall@k وزمن الاستعلام الواحد (خيط واحد، كما في الخدمة)"""
+    index.set_ef(max(search_ef, k))
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        labels, _ = index.knn_query(query, k=k, num_threads=1)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(expected.intersection(labels[0].tolist()))
+    latencies = np.asarray(latencies)
+    return {
+        "recall": hits / (k * len(queries)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+
+def tune(corpus, queries, k, spaces, m_values, construction_efs, search_efs):
+    truth = exact_neighbors(corpus, queries, k)
+    results = []
+    for space, m, construction_ef in itertools.product(spaces, m_values, construction_efs):
+        index = hnswlib.Index(space=space, dim=corpus.shape[1])
+        index.init_index(max_elements=len(corpus), ef_construction=construction_ef, M=m)
+        start = time.perf_counter()
+        index.add_items(corpus, np.arange(len(corpus)))
+        build_s = time.perf_counter() - start
+
+        for search_ef in search_efs:
+            metrics = evaluate_candidate(index, queries, truth, k, search_ef)
+            params = {"hnsw:space": space, "hnsw:M": m, "hnsw:construction_ef": construction_ef, "hnsw:search_ef": search_ef}
+            results.append({"params": params, "build_s": build_s, **metrics})
+            print(f"🔧 {params} → recall@{k}={metrics['recall']:.3f} p50={metrics['p50_ms']:.3f}ms p95={metrics['p95_ms']:.3f}ms")
+    return results
+
+
+def pareto_front(results):
+    """المرشحون الذين لا يتفوق عليهم أي مرشح آخر في الدقة والزمن معًا"""
+    front = []
+    for candidate in sorted(results, key=lambda r: (r["p50_ms"], -r["recall"])):
+        if not front or candidate["recall"] > front[-1]["recall"]:
+            front.append(candidate)
+    return front
+
+
+def choose(front, target_recall):
+    """أقل زمن يحقق الدقة المطلوبة، وإلا فأعلى دقة متاحة"""
+    meeting = [r for r in front if r["recall"] >= target_recall]
+    if meeting:
+        return min(meeting, key=lambda r: r["p50_ms"])
+    return max(front, key=lambda r: r["recall"])
+
+
+def write_collection_config(chosen, k, target_recall, config_file=COLLECTION_CONFIG_FILE):
+    config = {
+        "collection_metadata": chosen["params"],
+        "tuning": {
+            "k": k,
+            "target_recall": target_recall,
+            "recall": round(chosen["recall"], 4),
+            "p50_ms": round(chosen["p50_ms"], 4),
+            "p95_ms": round(chosen["p95_ms"], 4),
+            "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+    }
+    with open(config_file, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+
+# ✅ تحليل المدخلات الخاصة بالبرنامج
+def get_parser():
+    parser = argparse.ArgumentParser(description="ضبط إعدادات HNSW بناءً على recall وزمن الاستعلام")
+    parser.add_argument("--vector_store", type=str, default="./vector_store")
+    parser.add_argument("--evaluation_csv", type=str, default="evaluation_dataset.csv")
+    parser.add_argument("--sample_size", type=int, default=200, help="عدد أسئلة التقييم المستخدمة")
+    parser.add_argument("--k", type=int, default=10, help="عدد النتائج المسترجعة (top_k في الشات بوت)")
+    parser.add_argument("--target_recall", type=float, default=0.95)
+    parser.add_argument("--spaces", nargs="+", default=["l2", "cosine", "ip"])
+    parser.add_argument("--m", nargs="+", type=int, default=[8, 16, 32, 48])
+    parser.add_argument("--construction_ef", nargs="+", type=int, default=[64, 100, 200])
+    parser.add_argument("--search_ef", nargs="+", type=int, default=[10, 20, 40, 80, 160])
+    parser.add_argument("--config_file", type=str, default=COLLECTION_CONFIG_FILE)
+    parser.add_argument("--dry_run", action="store_true", help="طباعة النتائج فقط دون كتابة الإعدادات")
+    return parser
+
+
+def main():
+    args = get_parser().parse_args()
+
+    db, corpus = load_corpus_embeddings(args.vector_store)
+    questions = load_questions(args.evaluation_csv, args.sample_size)
+    print(f"📊 {len(corpus)} متجه في الفهرس، {len(questions)} سؤال للتقييم")
+    # عميل منفصل بإعادة المحاولات الافتراضية: عميل الشات بوت بلا إعادة محاولات لأنه يعمل ضمن مهلة الطلب
+    queries = np.asarray(OpenAIEmbeddings(model="text-embedding-ada-002").embed_documents(questions), dtype=np.float32)
+
+    results = tune(corpus, queries, args.k, args.spaces, args.m, args.construction_ef, args.search_ef)
+    front = pareto_front(results)
+
+    print(f"\n📈 Pareto front (recall@{args.k} مقابل p50):")
+    for r in front:
+        marker = " ← الإعدادات الافتراضية" if r["params"] == CHROMA_DEFAULTS else ""
+        print(f"   recall={r['recall']:.3f}  p50={r['p50_ms']:.3f}ms  p95={r['p95_ms']:.3f}ms  {r['params']}{marker}")
+
+    chosen = choose(front, args.target_recall)
+    if chosen["recall"] < args.target_recall:
+        print(f"⚠️ لا يوجد مرشح يحقق recall >= {args.target_recall}؛ تم اختيار الأعلى دقة.")
+    print(f"\n✅ الإعدادات المختارة: {chosen['params']}")
+
+    if not args.dry_run:
+        write_collection_config(chosen, args.k, args.target_recall, args.config_file)
+        print(f"📄 تم حفظ الإعدادات في {args.config_file} (تُطبق عند إعادة بناء الفهرس)")
+
+
+if __name__ == "__main__":
+    main()
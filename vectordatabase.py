@@ -3,6 +3,7 @@ import json
 import logging
 import os
 import pathlib
+import tempfile
 from typing import List, Tuple
 
 import langchain
@@ -12,6 +13,9 @@ from langchain.docstore.document import Document
 from langchain_openai import OpenAIEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
+from payload_store import PAYLOAD_DIR, build_payload_store_from_chroma, content_chunk_ids
+from index_snapshot import create_snapshot, export_snapshot, load_manifest, write_ingestion_config
+from extraction import lecture_text
 
 
 # ✅ إعداد مفتاح OpenAI API من `key.txt` أو المتغيرات البيئية
@@ -42,7 +46,7 @@ def load_documents(json_file: str) -> List[Document]:
     documents = []
     for category, lectures in data.items():
         for lecture in lectures:
-            content = lecture.get("content", "")
+            content = lecture_text(lecture)
             metadata = {
                 "lecture_title": lecture.get("lecture_title", "Unknown Title"),
                 "lecture_url": lecture.get("lecture_url", "Unknown URL"),
@@ -68,9 +72,13 @@ def create_vector_store(documents, vector_store_path: str = "./vector_store") ->
     vector_store = Chroma.from_documents(
         documents=documents,
         embedding=embedding_function,
+        ids=content_chunk_ids(documents, url_key="lecture_url"),
         persist_directory=vector_store_path,
     )
 
+    # بناء مخزن النصوص من المجموعة كاملة (الإضافة هنا تراكمية، فلا يكفي هذا التشغيل وحده)
+    build_payload_store_from_chroma(vector_store, os.path.join(vector_store_path, PAYLOAD_DIR))
+
     print("✅ تم حفظ قاعدة البيانات تلقائيًا في ChromaDB")
     return vector_store
 
@@ -86,10 +94,14 @@ def log_dataset(documents: List[Document], run: "wandb.run"):
 
 
 def log_index(vector_store_dir: str, run: "wandb.run"):
-    """تسجيل قاعدة بيانات المتجهات في wandb"""
-    index_artifact = wandb.Artifact(name="vector_store", type="search_index")
-    index_artifact.add_dir(vector_store_dir)
-    run.log_artifact(index_artifact)
+    """تسجيل لقطة من قاعدة بيانات المتجهات في wandb (الأجزاء المتغيرة فقط منذ اللقطة السابقة)"""
+    version = create_snapshot(vector_store_dir)
+    parent = load_manifest(version)["parent"]
+    index_artifact = wandb.Artifact(name="vector_store", type="search_index", metadata={"version": version, "parent": parent})
+    with tempfile.TemporaryDirectory() as bundle_dir:
+        export_snapshot(version, bundle_dir, base_version=parent)
+        index_artifact.add_dir(bundle_dir)
+        run.log_artifact(index_artifact)
 
 
 def log_prompt(prompt: dict, run: "wandb.run"):
@@ -168,6 +180,12 @@ def main():
         vector_store_path=args.vector_store,
     )
 
+    write_ingestion_config(args.vector_store, {
+        "json_file": args.json_file,
+        "chunk_size": args.chunk_size,
+        "chunk_overlap": args.chunk_overlap,
+    })
+
     # ✅ تسجيل البيانات في wandb
     log_dataset(documents, run)
     log_index(args.vector_store, run)